@@ -1,127 +1,171 @@
 import pandas as pd
 import re
 import os
-import glob
+import fnmatch
+import functools
 import sys
 
+_SIZE_PRIORITY = ('SM', 'S-M', 'S/M', 'ML', 'M-L', 'LXL')
+_PUNCT_RE = re.compile(r'[^a-z0-9 ]')
+_WS_RE = re.compile(r'\s+')
+_SKU_KV_RE = re.compile(r'sku=([^,|]+)', re.IGNORECASE)
+
+_EXCLUDED_BASE_SKUS = frozenset({
+    '101762', '102230', '102199', '102342', '103142', '103468', '103475',
+    '104076', '104097', '104545', '104546', '104928', '105468', '105491',
+    '105492', '105495', '105575', '105751', '105720', '105867', '105868',
+    '105875', '105876', '106260', '106222', '106248', '106335', '106328',
+    '106409', '106447', '106524', '106525', '106603', '106606', '106620',
+    '106634', '106727', '106132', '106288', '103469', '103471', '103472',
+    '103473', '106545', '103470', '103467', '100133', '103278', '106452',
+    '106453', '103474', '106242', '101772', '101774', '101775', '101776',
+    '103476', '104169', '104173', '105768', '107264', '107086', '107600',
+    '107601', '107602', '107597', '107598', '107599', '107604', '107619',
+    '107629', '107635', '107696', '107709', '107710', '107720', '107683',
+    '107715', '107800', '107859', '107888', '108028', '108029', '108030',
+    '108032', '108096', '108097', '108098', '108099', '108102', '108103',
+    '108107', '107664', '107261', '108322', '108326', '108404', '104094',
+    '108439', '108923', '108924', '109138', '109241', '109164', '109171',
+    'STERLING SILVER CROISSANT RING', '108993', '108998', '109015', '109017',
+    '109019', '109021', '109072', '109078', '109080', '109043', '108960',
+    '109372', '108860', '108861', '108854', '108853', '108846', '108842',
+    '108833', '108831', '108845', '108896', '108890', '108880', '108907',
+    '108655', '108894', '108849', '108840', '108834', '108822', '108823',
+    '108818', '108819', '108815', '108812', '108809', '108805', '108806',
+    '108797', '108792', '108788', '108784'
+})
+
+@functools.lru_cache(maxsize=None)
+def _normalize_name(name, suffix_re):
+    name = name.lower()
+    name = _PUNCT_RE.sub('', name)  # remove punctuation
+    name = suffix_re.sub('', name)
+    name = _WS_RE.sub(' ', name)
+    return name.strip()
+
 class MagentoProductProcessor:
-    def __init__(self, file_path=None):
+    # Only these export columns are read downstream
+    CSV_COLUMNS = {
+        'sku', 'name', 'visibility', 'product_online', 'base_image',
+        'configurable_variations', 'associated_skus'
+    }
+
+    def __init__(self, file_path=None, size_priority=_SIZE_PRIORITY,
+                 excluded_base_skus=_EXCLUDED_BASE_SKUS):
         self.file_path = file_path or self._find_latest_magento_file()
         self.df = None
-        self.size_priority = ['SM', 'S-M', 'S/M', 'ML', 'M-L', 'LXL']
-        self.size_pattern = r'-(SM|S-M|S/M|ML|M-L|LXL)$'
+        self.size_priority = list(size_priority)
+        self.excluded_base_skus = frozenset(excluded_base_skus)
+        self._size_rank = {size: rank for rank, size in enumerate(self.size_priority)}
+
+        # Size patterns are compiled once per processor from size_priority
+        sizes = '|'.join(re.escape(size) for size in self.size_priority)
+        self.size_pattern = rf'-({sizes})$'
+        self._size_re = re.compile(self.size_pattern)
+        # Longest first, so a suffix never shadows a longer one ending the same way
+        self._size_suffixes = tuple(sorted(
+            (f'-{size}' for size in self.size_priority), key=len, reverse=True
+        ))
+        self._suffix_re = re.compile(rf'\s*[-–]?({sizes.lower()})\s*$', re.IGNORECASE)
 
     def _find_latest_magento_file(self):
         pattern = "export_catalog_product_*.csv"
         search_dirs = ['.', 'exports', 'data', 'csv', 'downloads']
-        files = []
+        entries = []
         for directory in search_dirs:
-            files += glob.glob(os.path.join(directory, pattern))
+            try:
+                with os.scandir(directory) as it:
+                    entries += [e for e in it if e.is_file() and fnmatch.fnmatch(e.name, pattern)]
+            except OSError:
+                continue
 
-        if not files:
+        if not entries:
             raise FileNotFoundError("No Magento export files found.")
 
-        files.sort(key=os.path.getmtime, reverse=True)
-        print(f"📄 Using file: {files[0]}")
-        return files[0]
+        latest = max(entries, key=lambda e: e.stat().st_mtime).path
+        print(f"📄 Using file: {latest}")
+        return latest
 
     def load_csv(self):
         try:
-            self.df = pd.read_csv(self.file_path, encoding='utf-8', dtype=str)
+            self.df = pd.read_csv(
+                self.file_path, encoding='utf-8', dtype=str,
+                usecols=lambda col: col in self.CSV_COLUMNS
+            )
             if 'sku' not in self.df.columns:
                 raise ValueError("Missing 'sku' column in CSV.")
+            # Low-cardinality flags compare faster as category codes
+            for col in ('product_online', 'visibility'):
+                if col in self.df.columns:
+                    self.df[col] = self.df[col].astype('category')
             return True
         except Exception as e:
             print(f"❌ Failed to load CSV: {e}")
             return False
 
     def extract_size(self, sku):
-        match = re.search(self.size_pattern, str(sku))
-        return match.group(1) if match else None
+        sku = str(sku)
+        for suffix in self._size_suffixes:
+            if sku.endswith(suffix):
+                return suffix[1:]
+        return None
 
     def normalize_name(self, name):
-        name = str(name).lower()
-        name = re.sub(r'[^a-z0-9 ]', '', name)  # remove punctuation
-        name = re.sub(r'\s*[-–]?(sm|s-m|s/m|ml|m-l|lxl)\s*$', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\s+', ' ', name)
-        return name.strip()
+        return _normalize_name(str(name), self._suffix_re)
+
+    def normalize_names(self, names):
+        # Vectorized normalize_name over a Series of names
+        names = names.astype(str).str.lower()
+        names = names.str.replace(_PUNCT_RE, '', regex=True)
+        names = names.str.replace(self._suffix_re, '', regex=True)
+        names = names.str.replace(_WS_RE, ' ', regex=True)
+        return names.str.strip()
 
     def get_unassigned_variants(self):
         df = self.df.copy()
-        allowed_suffixes = ('-SM', '-S-M', '-S/M', '-ML', '-M-L', '-LXL')
-
-        excluded_base_skus = set(str(sku).strip() for sku in [
-            '101762', '102230', '102199', '102342', '103142', '103468', '103475',
-            '104076', '104097', '104545', '104546', '104928', '105468', '105491',
-            '105492', '105495', '105575', '105751', '105720', '105867', '105868',
-            '105875', '105876', '106260', '106222', '106248', '106335', '106328',
-            '106409', '106447', '106524', '106525', '106603', '106606', '106620',
-            '106634', '106727', '106132', '106288', '103469', '103471', '103472',
-            '103473', '106545', '103470', '103467', '100133', '103278', '106452',
-            '106453', '103474', '106242', '101772', '101774', '101775', '101776',
-            '103476', '104169', '104173', '105768', '107264', '107086', '107600',
-            '107601', '107602', '107597', '107598', '107599', '107604', '107619',
-            '107629', '107635', '107696', '107709', '107710', '107720', '107683',
-            '107715', '107800', '107859', '107888', '108028', '108029', '108030',
-            '108032', '108096', '108097', '108098', '108099', '108102', '108103',
-            '108107', '107664', '107261', '108322', '108326', '108404', '104094',
-            '108439', '108923', '108924', '109138', '109241', '109164', '109171',
-            'STERLING SILVER CROISSANT RING', '108993', '108998', '109015', '109017',
-            '109019', '109021', '109072', '109078', '109080', '109043', '108960',
-            '109372', '108860', '108861', '108854', '108853', '108846', '108842',
-            '108833', '108831', '108845', '108896', '108890', '108880', '108907',
-            '108655', '108894', '108849', '108840', '108834', '108822', '108823',
-            '108818', '108819', '108815', '108812', '108809', '108805', '108806',
-            '108797', '108792', '108788', '108784'
-        ])
-
         # Filter products with product_online = '1'
         if 'product_online' in df.columns:
-            df = df[df['product_online'].astype(str) == '1']
+            df = df[df['product_online'] == '1']
 
         df['sku'] = df['sku'].astype(str)
 
         # Identify variant SKUs ending with allowed size suffixes and NOT starting with 'P-'
-        df['is_variant'] = df['sku'].str.endswith(allowed_suffixes) & ~df['sku'].str.startswith('P-')
+        df['is_variant'] = df['sku'].str.endswith(self._size_suffixes) & ~df['sku'].str.startswith('P-')
         variants = df[df['is_variant']].copy()
 
         # Collect assigned SKUs from configurable_variations and associated_skus
         assigned_skus = set()
-        pattern = re.compile(r'sku=([^,|]+)', re.IGNORECASE)
-
         if 'configurable_variations' in df.columns:
-            for row in df['configurable_variations'].dropna():
-                found_skus = pattern.findall(str(row))
-                assigned_skus.update(s.strip() for s in found_skus)
+            found_skus = df['configurable_variations'].dropna().str.findall(_SKU_KV_RE).explode()
+            assigned_skus.update(found_skus.dropna().str.strip())
 
         if 'associated_skus' in df.columns:
-            for row in df['associated_skus'].dropna():
-                for sku in str(row).split(','):
-                    assigned_skus.add(sku.strip())
+            listed_skus = df['associated_skus'].dropna().str.split(',').explode()
+            assigned_skus.update(listed_skus.str.strip())
 
-        # Exclude any variant SKU if it is in assigned_skus
-        variants = variants[~variants['sku'].isin(assigned_skus)]
-
-        # Remove variants with existing P- parents
-        all_skus = set(df['sku'].dropna())
-        variants = variants[~variants['sku'].apply(lambda x: f'P-{x.split("-")[0]}' in all_skus)].copy()
+        # Exclude variant SKUs that are already assigned or have an existing P- parent
+        base_sku = variants['sku'].str.split('-', n=1).str[0]
+        variants = variants[
+            ~variants['sku'].isin(assigned_skus) & ~('P-' + base_sku).isin(df['sku'])
+        ].copy()
 
         # Normalize for grouping
-        variants['base_sku'] = variants['sku'].apply(lambda x: x.split('-')[0])
-        variants['size'] = variants['sku'].apply(self.extract_size)
-        variants['normalized_name'] = variants['name'].apply(self.normalize_name)
+        variants['base_sku'] = base_sku
+        variants['size'] = variants['sku'].str.extract(self._size_re, expand=False)
+        variants['size_rank'] = variants['size'].map(self._size_rank).fillna(99).astype('int8')
+        variants['normalized_name'] = self.normalize_names(variants['name'])
 
         # Exclude variants if parent with normalized name exists
         existing_parents = set()
         if 'sku' in df.columns and 'name' in df.columns:
             parent_df = df[df['sku'].str.startswith('P-')].copy()
-            parent_df['normalized_name'] = parent_df['name'].apply(self.normalize_name)
+            parent_df['normalized_name'] = self.normalize_names(parent_df['name'])
             existing_parents.update(parent_df['normalized_name'])
 
         variants = variants[~variants['normalized_name'].isin(existing_parents)]
 
         # Apply exclusion list by base sku
-        variants = variants[~variants['base_sku'].isin(excluded_base_skus)]
+        variants = variants[~variants['base_sku'].isin(self.excluded_base_skus)]
 
         # Fill missing columns for export
         for col in ['name', 'visibility', 'base_image', 'product_online']:
@@ -140,37 +184,43 @@ class MagentoProductProcessor:
         return variants, assigned_skus
 
     def generate_parent_products(self, unassigned_df):
-        parent_products = []
-        grouped = unassigned_df.groupby('normalized_name')
-
-        for normalized_name, group in grouped:
-            if len(group) < 2:
-                continue
-
-            group = group.copy()
-            group['size_rank'] = group['size'].apply(
-                lambda s: self.size_priority.index(s) if s in self.size_priority else 99
-            )
-            group_sorted = group.sort_values('size_rank')
-            template = group_sorted.iloc[0].copy()
-
-            parent_base_sku = sorted(group['base_sku'])[0]
-            parent_sku = f'P-{parent_base_sku}'
-
-            template['sku'] = parent_sku
-            template['name'] = normalized_name.upper()
-            template['visibility'] = 'Catalog, Search'
-            template['base_image'] = ','.join(group['base_image'].dropna().unique())
-
-            parent_products.append(template.drop([
-                'base_sku', 'size', 'size_rank', 'normalized_name'
-            ], errors='ignore'))
-
-        print(f"🏗️ Created {len(parent_products)} parent products")
-        return pd.DataFrame(parent_products)
+        # Only names shared by at least two variants get a parent
+        group_sizes = unassigned_df.groupby('normalized_name', sort=False)['sku'].transform('size')
+        df = unassigned_df[group_sizes >= 2]
+
+        # The smallest-size variant of each group is the parent template
+        templates = (
+            df.sort_values(['normalized_name', 'size_rank'])
+            .drop_duplicates('normalized_name')
+            .set_index('normalized_name')
+        )
+        parent_base_skus = df.groupby('normalized_name', sort=False)['base_sku'].min()
+
+        # Distinct images per group, joined in first-seen order
+        images = (
+            df.dropna(subset=['base_image'])
+            .drop_duplicates(['normalized_name', 'base_image'])
+            .groupby('normalized_name', sort=False)['base_image']
+            .agg(','.join)
+            .reindex(templates.index, fill_value='')
+        )
+
+        parents = pd.DataFrame({
+            'sku': 'P-' + parent_base_skus,
+            'name': templates.index.str.upper(),
+            'visibility': 'Catalog, Search',
+            'product_online': templates.get('product_online', ''),
+            'base_image': images,
+        }, index=templates.index).reset_index(drop=True)
+
+        print(f"🏗️ Created {len(parents)} parent products")
+        return parents
 
     def export_to_excel(self, unassigned_df, parent_df, assigned_skus, output_file="processed_output.xlsx"):
-        with pd.ExcelWriter(output_file) as writer:
+        with pd.ExcelWriter(
+            output_file, engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_urls': False}}
+        ) as writer:
             # Unassigned Variants tab
             cols_unassigned = ['sku', 'name', 'visibility', 'product_online', 'base_image']
             for col in cols_unassigned:
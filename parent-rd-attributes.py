@@ -41,54 +41,44 @@ class MagentoParentProductUpdater:
             ((all_rows['rd_ca_div_name'].isna()) | (all_rows['rd_ca_div_name'].str.strip() == ""))
         ].copy()
 
-        # Build a lookup dict: simple SKU => rd_ attributes dict
-        simple_rows = all_rows[all_rows['product_type'] == 'simple'].copy()
-        simple_lookup = {
-            sku: {col: row.get(col, "") for col in self.RD_COLUMNS}
-            for sku, row in simple_rows.set_index('sku').iterrows()
-        }
-
-        updated_rows = []
-
-        for _, parent in parents_empty_div.iterrows():
-            parent_sku = parent['sku']
-            base_sku = parent_sku[2:]  # Strip "P-"
-
-            variant_rd_values = None
-            matched_variant_sku = None
-
-            # Try each suffix until we find a match
-            for suffix in self.VARIANT_SUFFIXES:
-                candidate_sku = base_sku + suffix
-                if candidate_sku in simple_lookup:
-                    variant_rd_values = simple_lookup[candidate_sku]
-                    matched_variant_sku = candidate_sku
-                    break
-
-            updated_row = {
-                'sku': parent_sku,
-                'name': parent['name'],
-                'variant_source_sku': matched_variant_sku or ""
-            }
-
-            if variant_rd_values:
-                for col in self.RD_COLUMNS:
-                    updated_row[col] = variant_rd_values.get(col, "").strip()
-            else:
-                for col in self.RD_COLUMNS:
-                    updated_row[col] = ""
-
-            updated_rows.append(updated_row)
+        # Lookup frame: simple SKU => rd_ attributes
+        simple_rows = all_rows[all_rows['product_type'] == 'simple']
+        simple_rd = (
+            simple_rows.drop_duplicates('sku', keep='last')
+            .set_index('sku')
+            .reindex(columns=self.RD_COLUMNS, fill_value="")
+        )
+
+        # Try each suffix in priority order; the first match wins
+        base_skus = parents_empty_div['sku'].str[2:]  # Strip "P-"
+        matched_variant_skus = pd.Series(None, index=parents_empty_div.index, dtype=object)
+        for suffix in self.VARIANT_SUFFIXES:
+            candidate_skus = base_skus + suffix
+            found = matched_variant_skus.isna() & candidate_skus.isin(simple_rd.index)
+            matched_variant_skus = matched_variant_skus.mask(found, candidate_skus)
+
+        variant_rd_values = simple_rd.reindex(matched_variant_skus.to_numpy())
+
+        updated_parents = pd.DataFrame({
+            'sku': parents_empty_div['sku'].to_numpy(),
+            'name': parents_empty_div['name'].to_numpy(),
+            'variant_source_sku': matched_variant_skus.fillna("").to_numpy(),
+        })
+        for col in self.RD_COLUMNS:
+            updated_parents[col] = variant_rd_values[col].fillna("").str.strip().to_numpy()
 
         # Parents With Empty Columns tab: output original parents as is
         parents_with_empty_div = parents_empty_div[['sku', 'name'] + self.RD_COLUMNS].copy()
 
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            pd.DataFrame(updated_rows).to_excel(writer, index=False, sheet_name='Updated Parents')
+        with pd.ExcelWriter(
+            self.output_file, engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_urls': False}}
+        ) as writer:
+            updated_parents.to_excel(writer, index=False, sheet_name='Updated Parents')
             parents_with_empty_div.to_excel(writer, index=False, sheet_name='Parents With Empty Columns')
 
         print(f"✅ Finished! Output saved to {self.output_file}")
-        print(f"  - Updated Parents: {len(updated_rows)}")
+        print(f"  - Updated Parents: {len(updated_parents)}")
         print(f"  - Parents With Empty Columns: {len(parents_with_empty_div)}")
 
 if __name__ == '__main__':
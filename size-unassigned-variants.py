@@ -1,13 +1,20 @@
 import pandas as pd
+import numpy as np
+import openpyxl
 import re
 import os
-import glob
+import fnmatch
+from collections import defaultdict
 
 class MagentoParentProductCreator:
     SEARCH_DIRS = ['.', 'exports', 'data', 'csv', 'downloads']
     FILE_PATTERN = "export_catalog_product_*.csv"
     SIZE_SUFFIXES = ['SM', 'S-M', 'S/M', 'ML', 'M-L', 'M/L', 'LXL']
     SIZE_PRIORITY = ['SM', 'S-M', 'S/M', 'ML', 'M-L', 'M/L', 'LXL']
+    # Low-cardinality flags, parsed straight to categorical codes
+    CATEGORY_COLUMNS = ['product_type', 'product_online', 'visibility']
+    # Rows per CSV chunk, bounds peak memory on very large exports
+    CHUNK_SIZE = 200_000
 
     RD_COLUMNS = [
         'rd_ca_angel_numbers', 'rd_ca_cat_name', 'rd_ca_collection', 'rd_ca_dept_name',
@@ -16,178 +23,218 @@ class MagentoParentProductCreator:
         'rd_ca_plating', 'rd_ca_sub_category'
     ]
 
+    # Stock and website defaults shared by every generated parent
+    _PARENT_CONST_COLS = {
+        'qty': '0',
+        'out_of_stock_qty': '0',
+        'use_config_min_qty': '1',
+        'is_qty_decimal': '0',
+        'allow_backorders': '0',
+        'use_config_backorders': '1',
+        'min_cart_qty': '1',
+        'use_config_min_sale_qty': '1',
+        'max_cart_qty': '0',
+        'use_config_max_sale_qty': '1',
+        'is_in_stock': '1',
+        'notify_on_stock_below': '1',
+        'use_config_notify_stock_qty': '1',
+        'manage_stock': '1',
+        'use_config_manage_stock': '1',
+        'use_config_qty_increments': '1',
+        'qty_increments': '0',
+        'use_config_enable_qty_inc': '0',
+        'enable_qty_increments': '0',
+        'is_decimal_divided': '0',
+        'website_id': '1',
+        'related_skus': '',
+        'crosssell_skus': '',
+        'upsell_skus': '',
+    }
+
+    _SKU_RE = re.compile(r'sku=([^,|]+)')
+    # ' SIZE' endings checked by extract_size, in SIZE_SUFFIXES order
+    _SIZE_TUPLE = tuple(f' {s}' for s in SIZE_SUFFIXES)
+    # Trailing ' SIZE' (with any run of spaces/dashes before it) on a product name
+    _SIZE_TAIL_RE = re.compile(
+        r'[\s-]* (' + '|'.join(re.escape(s) for s in SIZE_SUFFIXES) + r')$'
+    )
+    # Whole product name split into base name and optional trailing size
+    _NAME_SPLIT_RE = re.compile(
+        r'^(?P<base>.*?)(?:[\s-]* (?P<size>' + '|'.join(re.escape(s) for s in SIZE_SUFFIXES) + r'))?$',
+        re.S
+    )
+    # Trailing size on a SKU, with '/' sizes normalized to '-'
+    _SKU_TAIL_RE = re.compile(
+        r'[-_]?(' + '|'.join(s.upper().replace('/', '-') for s in SIZE_PRIORITY) + r')$',
+        re.I
+    )
+
     def __init__(self):
         self.input_file = self._find_latest_magento_file()
         if not self.input_file:
             raise FileNotFoundError("No Magento CSV export file found.")
         print(f"📄 Loaded file: {self.input_file}")
-        self.df = pd.read_csv(self.input_file, dtype=str).fillna("")
         self.output_file = 'rings-parent-to-import.xlsx'
 
     def _find_latest_magento_file(self):
-        files = []
+        latest, latest_mtime = None, -1
         for directory in self.SEARCH_DIRS:
-            files.extend(glob.glob(os.path.join(directory, self.FILE_PATTERN)))
-        if not files:
-            return None
-        return max(files, key=os.path.getmtime)
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if not (entry.is_file() and fnmatch.fnmatch(entry.name, self.FILE_PATTERN)):
+                            continue
+                        mtime = entry.stat().st_mtime
+                        if mtime > latest_mtime:
+                            latest, latest_mtime = entry.path, mtime
+            except OSError:
+                continue
+        return latest
+
+    def _iter_chunks(self, usecols=None):
+        dtypes = defaultdict(lambda: str, {col: 'category' for col in self.CATEGORY_COLUMNS})
+        with pd.read_csv(
+            self.input_file, dtype=dtypes, na_filter=False, engine='c', memory_map=True,
+            usecols=usecols, chunksize=self.CHUNK_SIZE
+        ) as reader:
+            yield from reader
 
     def get_assigned_skus(self):
-        assigned_skus = set()
-        for row in self.df.itertuples(index=False):
-            if row.product_type == 'configurable' and row.configurable_variations:
-                matches = re.findall(r'sku=([^,|]+)', row.configurable_variations)
-                assigned_skus.update(matches)
-        return assigned_skus
+        chunk_skus = []
+        for chunk in self._iter_chunks(usecols=['product_type', 'configurable_variations']):
+            mask = (
+                (chunk['product_type'].to_numpy() == 'configurable') &
+                (chunk['configurable_variations'].to_numpy() != '')
+            )
+            variations = chunk.loc[mask, 'configurable_variations']
+            skus = variations.str.extractall(self._SKU_RE)[0].to_numpy()
+            chunk_skus.append(pd.unique(skus))
+        if not chunk_skus:
+            return pd.Index([])
+        return pd.Index(pd.unique(np.concatenate(chunk_skus)))
 
     def extract_size(self, name):
         # Extract size suffix at the end of the product name, e.g. "GOLD RING - SM"
-        for sfx in self.SIZE_SUFFIXES:
-            if name.strip().endswith(f" {sfx}"):
-                return sfx
-        return ""
+        name = name.strip()
+        if not name.endswith(self._SIZE_TUPLE):
+            return ""
+        for sfx in self._SIZE_TUPLE:
+            if name.endswith(sfx):
+                return sfx[1:]
 
     def base_name(self, name):
-        # Remove size suffix from the name
-        size = self.extract_size(name)
-        if size:
-            # Remove ' - SIZE' or ' SIZE' at the end
-            return re.sub(rf"[\s-]+{re.escape(size)}$", "", name.strip())
-        return name.strip()
+        # Remove ' - SIZE' or ' SIZE' at the end
+        name = name.strip()
+        match = self._SIZE_TAIL_RE.search(name)
+        return name[:match.start()] if match else name
 
     def get_unassigned_simple_skus(self):
         assigned_skus = self.get_assigned_skus()
-        simple = self.df[self.df['product_type'] == 'simple']
-        filtered = simple[
-            (simple['product_online'] == '1') &
-            (~simple['sku'].str.endswith('-NS')) &
-            (~simple['sku'].str.endswith('-Adjustable')) &
-            (simple['visibility'] == 'Catalog, Search')
-        ]
-        unassigned = filtered[~filtered['sku'].isin(assigned_skus)].copy()
-
-        # Add base name and size columns
-        unassigned['size'] = unassigned['name'].apply(self.extract_size)
-        unassigned['base_name'] = unassigned['name'].apply(self.base_name)
+        filtered = []
+        for df in self._iter_chunks():
+            mask = (
+                (df['product_type'] == 'simple') &
+                (df['product_online'] == '1') &
+                (~df['sku'].str.endswith(('-NS', '-Adjustable'))) &
+                (df['visibility'] == 'Catalog, Search') &
+                (~df['sku'].isin(assigned_skus))
+            )
+            filtered.append(df[mask])
+        unassigned = pd.concat(filtered)
+
+        # Add base name and size columns, splitting each distinct name only once
+        names = unassigned['name'].unique()
+        extracted = pd.Series(names, index=names).str.strip().str.extract(self._NAME_SPLIT_RE)
+        unassigned['size'] = unassigned['name'].map(extracted['size'].fillna(''))
+        unassigned['base_name'] = unassigned['name'].map(extracted['base'])
         return unassigned
 
     def create_parents(self, unassigned):
-        parent_rows = []
-
-        # Normalize sizes for reliable ranking and matching
-        def normalize_size(s):
-            if not s:
-                return ''
-            return s.strip().upper().replace('/', '-').replace(' ', '')
-
         SIZE_PRIORITY = [s.upper().replace('/', '-') for s in self.SIZE_PRIORITY]
-
-        # Group by base_name
-        grouped = unassigned.groupby('base_name')
-
-        for base_name, group in grouped:
-            if len(group) < 2:
-                # Need at least 2 variants to create a parent
-                continue
-
-            group = group.copy()
-
-            # Normalize sizes
-            group['size'] = group['size'].apply(normalize_size)
-
-            # Assign size rank for sorting
-            group['size_rank'] = group['size'].apply(
-                lambda x: SIZE_PRIORITY.index(x) if x in SIZE_PRIORITY else 999
-            )
-            group = group.sort_values('size_rank')
-
-            smallest = group.iloc[0]
-
-            # Remove size suffix from SKU, normalize suffix similarly
-            def remove_size_suffix_from_sku(sku):
-                sku_norm = sku.upper().strip()
-                pattern = r'[-_]?(' + '|'.join(SIZE_PRIORITY) + r')$'
-                return re.sub(pattern, '', sku_norm, flags=re.I)
-
-            base_sku = remove_size_suffix_from_sku(smallest['sku'])
-            parent_sku = f'P-{base_sku}'
-
-            parent_name = base_name
-
-            variations = [f"sku={row['sku']},size={row['size']}" for _, row in group.iterrows()]
-            associated_skus = ','.join(group['sku'].tolist())
-
-            rd_data = {col: smallest.get(col, '') for col in self.RD_COLUMNS}
-
-            parent_row = {
-                'sku': parent_sku,
-                'store_view_code': smallest.get('store_view_code', ''),
-                'attribute_set_code': smallest.get('attribute_set_code', ''),
-                'product_type': 'configurable',
-                'categories': smallest.get('categories', ''),
-                'product_websites': smallest.get('product_websites', ''),
-                'product_online': '1',
-                'name': parent_name,
-                'description': smallest.get('description', ''),
-                'short_description': smallest.get('short_description', ''),
-                'tax_class_name': smallest.get('tax_class_name', ''),
-                'visibility': 'Catalog, Search',
-                'price': smallest.get('price', ''),
-                'special_price': smallest.get('special_price', ''),
-                'special_price_from_date': smallest.get('special_price_from_date', ''),
-                'special_price_to_date': smallest.get('special_price_to_date', ''),
-                'meta_title': smallest.get('meta_title', ''),
-                'meta_keywords': smallest.get('meta_keywords', ''),
-                'meta_description': smallest.get('meta_description', ''),
-                'base_image': smallest.get('base_image', ''),
-                'base_image_label': smallest.get('base_image_label', ''),
-                'small_image': smallest.get('small_image', ''),
-                'small_image_label': smallest.get('small_image_label', ''),
-                'thumbnail_image': smallest.get('thumbnail_image', ''),
-                'thumbnail_image_label': smallest.get('thumbnail_image_label', ''),
-                'swatch_image': smallest.get('swatch_image', ''),
-                'swatch_image_label': smallest.get('swatch_image_label', ''),
-                'hover': smallest.get('hover', ''),
-                'created_at': smallest.get('created_at', ''),
-                'updated_at': smallest.get('updated_at', ''),
-                'additional_attributes': smallest.get('additional_attributes', ''),
-                'qty': '0',
-                'out_of_stock_qty': '0',
-                'use_config_min_qty': '1',
-                'is_qty_decimal': '0',
-                'allow_backorders': '0',
-                'use_config_backorders': '1',
-                'min_cart_qty': '1',
-                'use_config_min_sale_qty': '1',
-                'max_cart_qty': '0',
-                'use_config_max_sale_qty': '1',
-                'is_in_stock': '1',
-                'notify_on_stock_below': '1',
-                'use_config_notify_stock_qty': '1',
-                'manage_stock': '1',
-                'use_config_manage_stock': '1',
-                'use_config_qty_increments': '1',
-                'qty_increments': '0',
-                'use_config_enable_qty_inc': '0',
-                'enable_qty_increments': '0',
-                'is_decimal_divided': '0',
-                'website_id': '1',
-                'related_skus': '',
-                'crosssell_skus': '',
-                'upsell_skus': '',
-                'additional_images': smallest.get('additional_images', ''),
-                'additional_image_labels': smallest.get('additional_image_labels', ''),
-                'configurable_variations': '|'.join(variations),
-                'configurable_variation_labels': 'size=Size',
-                'associated_skus': associated_skus,
-            }
-
-            parent_row.update(rd_data)
-
-            parent_rows.append(parent_row)
-
-        return pd.DataFrame(parent_rows)
-
+        size_rank = {size: SIZE_PRIORITY.index(size) for size in SIZE_PRIORITY}
+
+        # Normalize sizes for reliable ranking and matching, then rank them once
+        sizes = (
+            unassigned['size'].str.strip().str.upper()
+            .str.replace('/', '-', regex=False).str.replace(' ', '', regex=False)
+        )
+        unassigned = unassigned.assign(
+            size=sizes,
+            size_rank=sizes.map(size_rank).fillna(999).astype('int32')
+        ).sort_values(['base_name', 'size_rank'])
+
+        # Need at least 2 variants to create a parent
+        group_sizes = unassigned.groupby('base_name', sort=False)['sku'].transform('size')
+        unassigned = unassigned[group_sizes >= 2]
+
+        # Groups are ordered by size, so each first row is the smallest variant
+        smallest = unassigned.drop_duplicates('base_name').set_index('base_name')
+
+        # Remove size suffix from SKU, normalize suffix similarly
+        base_skus = (
+            smallest['sku'].str.upper().str.strip()
+            .str.replace(self._SKU_TAIL_RE, '', regex=True)
+        )
+
+        # Both per-parent SKU lists come from a single grouping pass
+        joined = (
+            unassigned.assign(variation='sku=' + unassigned['sku'] + ',size=' + unassigned['size'])
+            .groupby('base_name', sort=False)
+            .agg(variations=('variation', '|'.join), associated_skus=('sku', ','.join))
+        )
+
+        rd_data = {col: smallest.get(col, '') for col in self.RD_COLUMNS}
+
+        parent_columns = {
+            'sku': 'P-' + base_skus,
+            'store_view_code': smallest.get('store_view_code', ''),
+            'attribute_set_code': smallest.get('attribute_set_code', ''),
+            'product_type': 'configurable',
+            'categories': smallest.get('categories', ''),
+            'product_websites': smallest.get('product_websites', ''),
+            'product_online': '1',
+            'name': smallest.index,
+            'description': smallest.get('description', ''),
+            'short_description': smallest.get('short_description', ''),
+            'tax_class_name': smallest.get('tax_class_name', ''),
+            'visibility': 'Catalog, Search',
+            'price': smallest.get('price', ''),
+            'special_price': smallest.get('special_price', ''),
+            'special_price_from_date': smallest.get('special_price_from_date', ''),
+            'special_price_to_date': smallest.get('special_price_to_date', ''),
+            'meta_title': smallest.get('meta_title', ''),
+            'meta_keywords': smallest.get('meta_keywords', ''),
+            'meta_description': smallest.get('meta_description', ''),
+            'base_image': smallest.get('base_image', ''),
+            'base_image_label': smallest.get('base_image_label', ''),
+            'small_image': smallest.get('small_image', ''),
+            'small_image_label': smallest.get('small_image_label', ''),
+            'thumbnail_image': smallest.get('thumbnail_image', ''),
+            'thumbnail_image_label': smallest.get('thumbnail_image_label', ''),
+            'swatch_image': smallest.get('swatch_image', ''),
+            'swatch_image_label': smallest.get('swatch_image_label', ''),
+            'hover': smallest.get('hover', ''),
+            'created_at': smallest.get('created_at', ''),
+            'updated_at': smallest.get('updated_at', ''),
+            'additional_attributes': smallest.get('additional_attributes', ''),
+            **self._PARENT_CONST_COLS,
+            'additional_images': smallest.get('additional_images', ''),
+            'additional_image_labels': smallest.get('additional_image_labels', ''),
+            'configurable_variations': joined['variations'],
+            'configurable_variation_labels': 'size=Size',
+            'associated_skus': joined['associated_skus'],
+        }
+
+        parent_columns.update(rd_data)
+
+        return pd.DataFrame(parent_columns, index=smallest.index, copy=False).reset_index(drop=True)
+
+
+    def _write_sheet(self, workbook, sheet_name, df):
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            sheet.append(row)
 
     def run(self):
         unassigned = self.get_unassigned_simple_skus()
@@ -200,13 +247,15 @@ class MagentoParentProductCreator:
         # Drop helper columns before output
         unassigned = unassigned.drop(columns=['base_name', 'size'], errors='ignore')
 
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            unassigned.to_excel(writer, index=False, sheet_name='Unassigned Variants')
-            if not parent_df.empty:
-                parent_df.to_excel(writer, index=False, sheet_name='Parent Products')
-                print(f"✅ {len(parent_df)} parent products exported.")
-            else:
-                print("✅ No parent products generated.")
+        # Write-only workbook streams rows to disk instead of building every cell in memory
+        workbook = openpyxl.Workbook(write_only=True)
+        self._write_sheet(workbook, 'Unassigned Variants', unassigned)
+        if not parent_df.empty:
+            self._write_sheet(workbook, 'Parent Products', parent_df)
+            print(f"✅ {len(parent_df)} parent products exported.")
+        else:
+            print("✅ No parent products generated.")
+        workbook.save(self.output_file)
 
         print(f"📁 Excel file saved as: {self.output_file}")
 